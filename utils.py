@@ -11,12 +11,13 @@ It also defines constants for plotting and scenario configurations.
 """
 
 import math
+from functools import cache
 from typing import Any, Dict
 
 import matplotlib.pyplot as plt
 import numpy as np
 import seaborn as sns
-from scipy import sparse, special, stats
+from scipy import linalg, sparse, special, stats
 from tqdm import tqdm
 
 # Colors used in plots
@@ -76,11 +77,20 @@ def cholesky_from_svd(a: np.ndarray) -> np.ndarray:
         The Cholesky decomposition of the input matrix.
     """
     u, s, _ = np.linalg.svd(a)
-    b = np.diag(np.sqrt(s)) @ u.T
+    b = np.sqrt(s)[:, None] * u.T
     _, r = np.linalg.qr(b)
     return r.T
 
 
+@cache
+def _leggauss(n: int) -> tuple[np.ndarray, np.ndarray]:
+    """Return the (read-only) Gauss-Legendre knots and weights on [-1, 1] (cached)."""
+    knots, weights = np.polynomial.legendre.leggauss(n)
+    knots.setflags(write=False)
+    weights.setflags(write=False)
+    return knots, weights
+
+
 def gauss_legendre(a: float, b: float, n: int) -> tuple[np.ndarray, np.ndarray]:
     """
     Compute the Gauss-Legendre quadrature points and weights on the interval [a, b].
@@ -101,18 +111,20 @@ def gauss_legendre(a: float, b: float, n: int) -> tuple[np.ndarray, np.ndarray]:
         - Quadrature points on [a, b].
         - Quadrature weights on [a, b].
     """
-    knots, weights = np.polynomial.legendre.leggauss(n)
+    knots, weights = _leggauss(n)
     knots_a_b = 0.5 * (b - a) * knots + 0.5 * (b + a)
     weights_a_b = 0.5 * (b - a) * weights
     return knots_a_b, weights_a_b
 
 
+@cache
 def gauss_hermite(n: int) -> tuple[np.ndarray, np.ndarray]:
     """
     Compute the Gauss-Hermite quadrature points and weights.
 
     Integration is with respect to the Gaussian density. It corresponds to the
-    probabilist's Hermite polynomials.
+    probabilist's Hermite polynomials. Results are cached on n and returned as
+    read-only arrays.
 
     Parameters
     ----------
@@ -129,6 +141,8 @@ def gauss_hermite(n: int) -> tuple[np.ndarray, np.ndarray]:
     knots, weights = np.polynomial.hermite.hermgauss(n)
     knots *= np.sqrt(2)
     weights /= np.sqrt(np.pi)
+    knots.setflags(write=False)
+    weights.setflags(write=False)
     return knots, weights
 
 
@@ -153,7 +167,7 @@ def coef_gauss_pce(n: int, x: np.ndarray) -> np.ndarray:
     """
     if n == 0:
         return stats.norm.cdf(-x)
-    coef = stats.norm.pdf(x) * special.hermitenorm(n=n - 1)(x) / math.factorial(n)
+    coef = stats.norm.pdf(x) * special.eval_hermitenorm(n - 1, x) / math.factorial(n)
     return coef
 
 
@@ -186,26 +200,30 @@ def mean_gauss_pce(n: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
         raise ValueError("a and b must have the same shape.")
 
     mean_pce = np.zeros((n + 1, a.shape[0]), dtype=np.float64)
-    x = b / (1.0 + a**2) ** 0.5
-    for i in range(n + 1):
-        if i == 0:
-            mean_pce[0, :] = stats.norm.cdf(-x)
-        elif i == 1:
-            mean_pce[1, :] = (
-                np.exp(-(x**2) / 2.0) / np.sqrt(2.0 * np.pi) / np.sqrt(1.0 + a**2)
-            )
-        elif i == 2:
-            mean_pce[2, :] = (b / 2.0) * mean_pce[1, :] / (1.0 + a**2)
-        else:
-            mean_pce[i, :] = (b / i) * mean_pce[i - 1, :] - (
-                (i - 2) / (i * (i - 1.0))
-            ) * mean_pce[i - 2, :]
-            mean_pce[i, :] /= 1.0 + a**2
+    inv = 1.0 / (1.0 + a**2)
+    x = b * np.sqrt(inv)
+    mean_pce[0, :] = stats.norm.cdf(-x)
+    if n == 0:
+        return mean_pce
+
+    mean_pce[1, :] = np.exp(-(x**2) / 2.0) / np.sqrt(2.0 * np.pi) * np.sqrt(inv)
+    if n == 1:
+        return mean_pce
+
+    # Three-term recurrence, the loop invariants b / (1 + a^2) and 1 / (1 + a^2)
+    # are computed once
+    b_inv = b * inv
+    mean_pce[2, :] = 0.5 * b_inv * mean_pce[1, :]
+    for i in range(3, n + 1):
+        mean_pce[i, :] = (b_inv / i) * mean_pce[i - 1, :]
+        mean_pce[i, :] -= ((i - 2) / (i * (i - 1.0))) * inv * mean_pce[i - 2, :]
 
     return mean_pce
 
 
-def _sigma0_matrix(n: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+def _sigma0_matrix(
+    n: int, a: np.ndarray, b: np.ndarray, mu_n: np.ndarray | None = None
+) -> np.ndarray:
     """
     Compute the first row of the PCE covariance matrix
     for a given order n and input vectors a and b.
@@ -218,6 +236,8 @@ def _sigma0_matrix(n: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
         Vector of standard deviations.
     b : np.ndarray
         Vector of means.
+    mu_n : np.ndarray, optional
+        Precomputed mean_gauss_pce(n, a, b), computed here if not provided.
 
     Returns
     -------
@@ -227,14 +247,18 @@ def _sigma0_matrix(n: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
 
     size_a = np.shape(a)[0]
     sigma0_n = np.zeros((n + 1, size_a), dtype=np.float64)
-    mu_n = mean_gauss_pce(n=n, a=a, b=b)
+    if mu_n is None:
+        mu_n = mean_gauss_pce(n=n, a=a, b=b)
     mu_n2 = mean_gauss_pce(n=n, a=a / np.sqrt(1.0 + a**2), b=b / (1.0 + a**2))
 
-    tmp = np.zeros_like(a)
-    for k in range(size_a):
-        mean_k = [0, 0]
-        cov_k = [[1 + a[k] ** 2, a[k] ** 2], [a[k] ** 2, 1 + a[k] ** 2]]
-        tmp[k] = stats.multivariate_normal.cdf(x=[-b[k], -b[k]], mean=mean_k, cov=cov_k)
+    # Bivariate normal CDF P(X_1 < -b, X_2 < -b) with Var[X_i] = 1 + a^2 and
+    # Cov[X_1, X_2] = a^2, computed in closed form with Owen's T function:
+    # Phi_2(h, h; rho) = Phi(h) - 2 T(h, sqrt((1 - rho) / (1 + rho)))
+    h = -b / np.sqrt(1.0 + a**2)
+    rho = a**2 / (1.0 + a**2)
+    tmp = stats.norm.cdf(h) - 2.0 * special.owens_t(
+        h, np.sqrt((1.0 - rho) / (1.0 + rho))
+    )
 
     sigma0_n[0] = tmp - mu_n[0] ** 2
 
@@ -288,16 +312,19 @@ def cov_gauss_pce(n: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
     mean_vector = mean_gauss_pce(n=n, a=a, b=b)
 
     cov_matrix = np.zeros((n + 1, n + 1, a.shape[0]))
-    cov_matrix[0, :, :] = _sigma0_matrix(n=n, a=a, b=b)
+    cov_matrix[0, :, :] = _sigma0_matrix(n=n, a=a, b=b, mu_n=mean_vector)
     cov_matrix[:, 0, :] = cov_matrix[0, :, :]
 
+    # Row i + 1 only depends on row i, so the recurrence is vectorized over
+    # the column index j = 0, ..., n - 2 and over the K entries of a and b
+    j = np.arange(n - 1, dtype=np.float64)[:, None]
+    a2 = a**2
     for i in range(0, n):
-        for j in range(0, n - 1):
-            cov_matrix[i + 1, j + 1, :] = (1 / ((i + 1) * (a**2))) * (
-                -(1 + a**2) * (j + 2) * cov_matrix[i, j + 2, :]
-                + b * cov_matrix[i, j + 1, :]
-                - (j / (j + 1)) * cov_matrix[i, j, :]
-            ) - mean_vector[i + 1] * mean_vector[j + 1]
+        cov_matrix[i + 1, 1:n, :] = (1 / ((i + 1) * a2)) * (
+            -(1 + a2) * (j + 2) * cov_matrix[i, 2 : n + 1, :]
+            + b * cov_matrix[i, 1:n, :]
+            - (j / (j + 1)) * cov_matrix[i, 0 : n - 1, :]
+        ) - mean_vector[i + 1] * mean_vector[1:n]
 
     return cov_matrix
 
@@ -331,76 +358,56 @@ def mean_cov_pce_quad(
     a = np.atleast_1d(a)
     b = np.atleast_1d(b)
 
-    def compute_mean_pce(w_he, y_he_ab, sig):
+    def compute_mean_pce(w_he, herm_y, exp_term, inv_fact):
         """
         Compute the mean vector for the PCE using Gauss-Hermite quadrature.
         """
         mean_pce_quad = np.zeros((n_pce + 1, a.shape[0]))
-        for m in range(n_pce + 1):
-            if m == 0:
-                mean_pce_quad[m] = stats.norm.cdf(-b / (1.0 + a**2) ** 0.5)
-            elif m == 1:
-                mean_pce_quad[m] = (
-                    stats.norm.pdf(b / (1.0 + a**2) ** 0.5) / (1.0 + a**2) ** 0.5
-                )
-            else:
-                mean_pce_quad[m] = (
-                    np.sum(
-                        w_he[:, None] * special.hermitenorm(m - 1)(y_he_ab),
-                        axis=0,
-                    )
-                    * sig
-                    * np.exp(-0.5 * b**2 / (a**2 + 1.0))
-                    / (np.sqrt(2.0 * np.pi) * math.factorial(m))
-                )
+        mean_pce_quad[0] = stats.norm.cdf(-b * sig)
+        if n_pce >= 1:
+            mean_pce_quad[1] = exp_term
+        mean_pce_quad[2:] = (
+            np.einsum("q,mqk->mk", w_he, herm_y[1:]) * exp_term * inv_fact[1:, None]
+        )
         return mean_pce_quad
 
-    def compute_cov_pce(x_he_ab, y_he_ab, w_he, sig, mean_pce_quad):
+    def compute_cov_pce(x_he_ab, herm_y, w_he, exp_term, inv_fact, mean_pce_quad):
         """
         Compute the covariance matrix for the PCE using Gauss-Hermite
         quadrature.
         """
-        cov_pce_quad = np.zeros((n_pce + 1, n_pce + 1, a.shape[0]))
-        for m1 in range(n_pce + 1):
-            if m1 == 0:
-                integrand_m1 = coef_gauss_pce(n=0, x=x_he_ab)
-            else:
-                integrand_m1 = (
-                    special.hermitenorm(m1 - 1)(y_he_ab)
-                    * sig
-                    * np.exp(-0.5 * b**2 / (a**2 + 1.0))
-                    / (np.sqrt(2.0 * np.pi) * math.factorial(m1))
-                )
-            for m2 in range(m1, n_pce + 1):
-                if m2 == 0:
-                    integrand_m2 = coef_gauss_pce(n=0, x=x_he_ab)
-                else:
-                    integrand_m2 = (
-                        special.hermitenorm(m2 - 1)(y_he_ab)
-                        * sig
-                        * np.exp(-0.5 * b**2 / (a**2 + 1.0))
-                        / (np.sqrt(2.0 * np.pi) * math.factorial(m2))
-                    )
-                cov_pce_quad[m1, m2, :] = np.sum(
-                    w_he[:, None] * integrand_m1 * integrand_m2, axis=0
-                )
-                cov_pce_quad[m1, m2, :] -= mean_pce_quad[m1, :] * mean_pce_quad[m2, :]
-
-        # Fill in the lower triangular part of the covariance matrix
-        cov_pce_quad = np.triu(cov_pce_quad) + np.tril(
-            cov_pce_quad.transpose(1, 0, 2), -1
-        )
+        # Integrands for m = 0, ..., n_pce scaled by the square root of the
+        # (positive) quadrature weights, shape is (n_pce + 1, n_quad, K)
+        integrand = np.empty((n_pce + 1,) + x_he_ab.shape)
+        integrand[0] = coef_gauss_pce(n=0, x=x_he_ab)
+        integrand[1:] = herm_y * exp_term[None, None, :] * inv_fact[:, None, None]
+        integrand *= np.sqrt(w_he)[None, :, None]
+
+        # Symmetric by construction, no need to fill the lower triangular part
+        cov_pce_quad = np.einsum("mqk,nqk->mnk", integrand, integrand)
+        cov_pce_quad -= mean_pce_quad[:, None, :] * mean_pce_quad[None, :, :]
         return cov_pce_quad
 
+    # Terms shared by all PCE orders
+    one_plus_a2 = 1.0 + a**2
+    sig = 1.0 / np.sqrt(one_plus_a2)
+    mu = -a * b / one_plus_a2
+    exp_term = sig * np.exp(-0.5 * b**2 / one_plus_a2) / np.sqrt(2.0 * np.pi)
+    inv_fact = 1.0 / np.array(
+        [math.factorial(m) for m in range(1, n_pce + 1)], dtype=np.float64
+    )
+
     x_he, w_he = gauss_hermite(n=n_quad)
     x_he_ab = a[None, :] * x_he[:, None] + b[None, :]
-    mu = -a * b / (1.0 + a**2)
-    sig = 1.0 / np.sqrt(1.0 + a**2)
     y_he_ab = a[None, :] * (sig[None, :] * x_he[:, None] + mu[None, :]) + b[None, :]
+    # Table of He_m(y_he_ab) for m = 0, ..., n_pce - 1, shape is (n_pce, n_quad, K)
+    herm_y = special.eval_hermitenorm(np.arange(n_pce)[:, None, None], y_he_ab)
 
     # Compute the mean vector and covariance matrix
-    mean_pce_quad = compute_mean_pce(w_he, y_he_ab, sig)
-    cov_pce_quad = compute_cov_pce(x_he_ab, y_he_ab, w_he, sig, mean_pce_quad)
+    mean_pce_quad = compute_mean_pce(w_he, herm_y, exp_term, inv_fact)
+    cov_pce_quad = compute_cov_pce(
+        x_he_ab, herm_y, w_he, exp_term, inv_fact, mean_pce_quad
+    )
 
     return (mean_pce_quad, cov_pce_quad)
 
@@ -413,12 +420,9 @@ def eig_cov_x(n, b_min, b_max, t=1.0, seed=None):
     if seed is not None:
         np.random.seed(seed)
     b = np.random.uniform(b_min, b_max, size=n)
-    b_rep = np.tile(b, (n, 1))
     rho = np.random.uniform(-1, 1, size=n)
-    rho_rep = np.tile(rho, (n, 1))
-    cov_x = (
-        (rho_rep * rho_rep.T) * (1 - np.exp(-(b_rep + b_rep.T) * t)) / (b_rep + b_rep.T)
-    )
+    b_sum = b[:, None] + b[None, :]
+    cov_x = (rho[:, None] * rho[None, :]) * (1 - np.exp(-b_sum * t)) / b_sum
     _, eig_x, _ = np.linalg.svd(cov_x)
     return eig_x
 
@@ -438,14 +442,17 @@ def compute_inertia(tab_n, n_mc, b_min=0, b_max=1, t=1.0):
         inertia_n_2f = np.zeros(n_mc)
         for i in range(n_mc):
             b = np.random.uniform(b_min, b_max, size=n)
-            b = np.tile(b, (n, 1))
             rho = np.random.uniform(-1, 1, size=n)
-            rho = np.tile(rho, (n, 1))
-            cov_x = (rho * rho.T) * (1 - np.exp(-(b + b.T) * t)) / (b + b.T)
-            eig_x, _ = sparse.linalg.eigs(cov_x, k=2)
-            eig_x = np.real(eig_x)
-            inertia_n_1f[i] = eig_x[0] / np.trace(cov_x)
-            inertia_n_2f[i] = (eig_x[0] + eig_x[1]) / np.trace(cov_x)
+            b_sum = b[:, None] + b[None, :]
+            cov_x = (rho[:, None] * rho[None, :]) * (1 - np.exp(-b_sum * t)) / b_sum
+            # cov_x is symmetric positive semi-definite: Lanczos for the two
+            # largest eigenvalues (returned in ascending order)
+            eig_x = sparse.linalg.eigsh(
+                cov_x, k=2, which="LA", return_eigenvectors=False
+            )[::-1]
+            trace_x = np.trace(cov_x)
+            inertia_n_1f[i] = eig_x[0] / trace_x
+            inertia_n_2f[i] = (eig_x[0] + eig_x[1]) / trace_x
 
         list_inertia.append([np.mean(inertia_n_1f), np.mean(inertia_n_2f)])
 
@@ -496,16 +503,10 @@ def compute_multi_index(n_pce: int):
     """
     Compute the multi-index for PCE coefficients.
     """
-    tab_multi_idx = np.array(
-        [
-            [int(m1), int(m - m1), int(special.comb(m, m1))]
-            for m in np.arange(n_pce + 1)
-            for m1 in np.arange(m + 1)
-        ]
-    ).T
-    m1 = tab_multi_idx[0, :]
-    m2 = tab_multi_idx[1, :]
-    m_comb = tab_multi_idx[2, :]
+    # All pairs (m, m1) with 0 <= m1 <= m <= n_pce, ordered by m then m1
+    m, m1 = np.tril_indices(n_pce + 1)
+    m2 = m - m1
+    m_comb = np.rint(special.comb(m, m1)).astype(m.dtype)
     return m1, m2, m_comb
 
 
@@ -536,6 +537,8 @@ def compute_loss_pca_pce(
         - return_loss_full (bool): Whether to return the full loss vector.
         - n_quad (int): Number of quadrature points (default: 40).
         - seed (int): Random seed for reproducibility (default: None).
+        - batch_size (int): Number of Monte Carlo samples simulated at once
+          (default: 4096).
 
     Returns
     -------
@@ -547,51 +550,76 @@ def compute_loss_pca_pce(
         np.random.seed(kwargs.get("seed", None))
 
     tab_m1, tab_m2, tab_multi = compute_multi_index(n_pce)
-    l1_normalized_m1 = np.array(
-        [params["l1_normalized"][i] ** tab_m1 for i in range(n_firms)]
-    ).T
-    l2_normalized_m2 = np.array(
-        [params["l2_normalized"][i] ** tab_m2 for i in range(n_firms)]
-    ).T
-
-    if kwargs.get("return_eps_full", False) or kwargs.get("return_loss_full", False):
-
-        def simulate_vec_eps_full():
-            # Simulating vector eps without Gaussian approximation
-            vec_a = params["mean_a_normalized"][:, None] + params["std_a_normalized"][
-                :, None
-            ] * np.random.randn(n_firms, n_mc)
-            tau_vec_a_m1_m2 = np.array(
-                [coef_gauss_pce(n=int(m), x=vec_a) for m in np.arange(n_pce + 1)]
-            )[tab_m1 + tab_m2, :, :]
-
-            # Summing over all firms
-            vec_eps_full = np.sum(
-                params["tab_lambda"][None, :, None]
-                * tab_multi[:, None, None]
-                * tau_vec_a_m1_m2
-                * l1_normalized_m1[:, :, None]
-                * l2_normalized_m2[:, :, None],
-                axis=1,
-            )
-            return vec_eps_full
-
-        vec_eps_full = simulate_vec_eps_full()
-
-        if kwargs.get("return_eps_full", False):
-            return vec_eps_full
-
-    # Product of Hermite polynomials
-    he_m1_m2 = np.array(
-        [
-            special.hermitenorm(tab_m1[i])(np.random.randn(n_mc))
-            * special.hermitenorm(tab_m2[i])(np.random.randn(n_mc))
-            for i in range(int((n_pce + 1) * (n_pce + 2) / 2))
-        ]
+    # Powers l1^m1 and l2^m2, shape is (n_eps, n_firms)
+    l1_normalized_m1 = params["l1_normalized"][None, :] ** tab_m1[:, None]
+    l2_normalized_m2 = params["l2_normalized"][None, :] ** tab_m2[:, None]
+
+    n_eps = tab_m1.shape[0]  # shape of the vector eps
+    # Monte Carlo samples are simulated in batches to cap the peak memory
+    batch_size = kwargs.get("batch_size", 4096)
+    if batch_size < 1:
+        raise ValueError("batch_size must be a positive integer.")
+    tab_n_batch = [min(batch_size, n_mc - i) for i in range(0, n_mc, batch_size)]
+
+    # Firm weights lambda * C(m, m1) * l1^m1 * l2^m2, shape is (n_eps, n_firms)
+    weights = (
+        params["tab_lambda"][None, :]
+        * tab_multi[:, None]
+        * l1_normalized_m1
+        * l2_normalized_m2
     )
+    tab_m = tab_m1 + tab_m2
+
+    def simulate_vec_eps_full(n_sim):
+        """Simulate the vector eps without Gaussian approximation."""
+        vec_a = params["mean_a_normalized"][:, None] + params["std_a_normalized"][
+            :, None
+        ] * np.random.randn(n_firms, n_sim)
+        # Summing over all firms: all entries of eps sharing the same order
+        # m1 + m2 use the same PCE coefficient, so the sum is one matrix
+        # product per order and no (n_eps, n_firms, n_sim) tensor is formed
+        # The Gaussian density is shared by all orders m >= 1 of coef_gauss_pce
+        pdf_a = stats.norm.pdf(vec_a)
+        vec_eps_full = np.empty((n_eps, n_sim))
+        for m in range(n_pce + 1):
+            if m == 0:
+                tau_m = coef_gauss_pce(n=0, x=vec_a)
+            else:
+                tau_m = pdf_a * special.eval_hermitenorm(m - 1, vec_a)
+                tau_m /= math.factorial(m)
+            idx_m = tab_m == m
+            vec_eps_full[idx_m] = weights[idx_m] @ tau_m
+        return vec_eps_full
+
+    def simulate_he_m1_m2(n_sim):
+        """Simulate the products of Hermite polynomials He_m1(Z_1) * He_m2(Z_2)."""
+        # The two factors Z_1 and Z_2 are shared by all entries of eps
+        z_1 = np.random.randn(n_sim)
+        z_2 = np.random.randn(n_sim)
+        he_m1 = special.eval_hermitenorm(tab_m1[:, None], z_1[None, :])
+        he_m2 = special.eval_hermitenorm(tab_m2[:, None], z_2[None, :])
+        return he_m1 * he_m2
+
+    if kwargs.get("return_eps_full", False):
+        if n_mc == 0:
+            return np.empty((n_eps, 0))
+        return np.concatenate(
+            [simulate_vec_eps_full(n_batch) for n_batch in tab_n_batch], axis=1
+        )
 
     if kwargs.get("return_loss_full", False):
-        return np.sum(vec_eps_full * he_m1_m2, axis=0)
+        if n_mc == 0:
+            return np.empty(0)
+        return np.concatenate(
+            [
+                np.einsum(
+                    "es,es->s",
+                    simulate_vec_eps_full(n_batch),
+                    simulate_he_m1_m2(n_batch),
+                )
+                for n_batch in tab_n_batch
+            ]
+        )
 
     def get_cov_eps():
         """Compute the mean and covariance matrix of the vector eps."""
@@ -603,59 +631,30 @@ def compute_loss_pca_pce(
         )
 
         # Mean of the vector eps
-        mean_eps = np.sum(
-            tab_multi[:, None]
-            * params["tab_lambda"][None, :]
-            * _mean_a_pce[tab_m1 + tab_m2, :]
-            * l1_normalized_m1
-            * l2_normalized_m2,
-            axis=1,
-        )
+        mean_eps = np.einsum("ef,ef->e", weights, _mean_a_pce[tab_m, :])
 
-        n_eps = int((n_pce + 1) * (n_pce + 2) / 2)  # shape of the vector eps
         # Covariance of the vector eps
-        mat_m1 = np.tile(tab_m1, (n_eps, 1))
-        mat_m2 = np.tile(tab_m2, (n_eps, 1))
-        mat_m1_m2 = np.tile(tab_m1 + tab_m2, (n_eps, 1))
-        mat_l1_normalized = np.array(
-            [params["l1_normalized"][i] ** mat_m1 for i in range(n_firms)]
-        ).T
-        mat_l1_normalized_transpose = np.array(
-            [params["l1_normalized"][i] ** mat_m1.T for i in range(n_firms)]
-        ).T
-        mat_l2_normalized = np.array(
-            [params["l2_normalized"][i] ** mat_m2 for i in range(n_firms)]
-        ).T
-        mat_l2_normalized_transpose = np.array(
-            [params["l2_normalized"][i] ** mat_m2.T for i in range(n_firms)]
-        ).T
-
-        mat_multi = np.tile(tab_multi, (n_eps, 1))
-        cov_eps = (
-            mat_multi
-            * mat_multi.T
-            * np.sum(
-                params["tab_lambda"][None, None, :] ** 2
-                * _cov_a_pce[mat_m1_m2, mat_m1_m2.T, :]
-                * mat_l1_normalized
-                * mat_l2_normalized
-                * mat_l1_normalized_transpose
-                * mat_l2_normalized_transpose,
-                axis=2,
-            )
+        cov_eps = np.einsum(
+            "pf,qf,pqf->pq",
+            weights,
+            weights,
+            _cov_a_pce[np.ix_(tab_m, tab_m)],
+            optimize=True,
         )
         return mean_eps, cov_eps
 
     if kwargs.get("return_mean_cov_eps", False):
         return get_cov_eps()
 
-    def simulate_vec_eps(n_eps, n_mc, mean_eps, cov_eps):
-        """Simulate the vector eps."""
+    def factor_cov_eps(cov_eps):
+        """
+        Compute a square root of the covariance of eps.
+
+        Returns the factor and whether it is the lower triangular Cholesky factor.
+        """
         try:
             # Cholesky
-            chol_cov_eps = np.linalg.cholesky(cov_eps)
-            z = np.random.randn(n_eps, n_mc)
-            vec_eps = mean_eps[:, None] + chol_cov_eps @ z
+            return np.linalg.cholesky(cov_eps), True
         except np.linalg.LinAlgError:
             # # Cholesky from SVD
             # print("Cholesky from SVD")
@@ -663,18 +662,36 @@ def compute_loss_pca_pce(
 
             # PCA decomposition
             u_cov_eps, eigs_cov_eps, _ = np.linalg.svd(cov_eps)
-            vec_eps = np.zeros((eigs_cov_eps.shape[0], n_mc))
-            for idx in range(n_eps):
-                z = np.random.randn(n_mc)
-                u_z = u_cov_eps[:, idx][:, None] * z[None, :]
-                vec_eps += np.sqrt(eigs_cov_eps[idx]) * u_z
-            vec_eps += mean_eps[:, None]
+            return u_cov_eps * np.sqrt(eigs_cov_eps), False
+
+    def simulate_vec_eps(n_sim, mean_eps, sqrt_cov_eps, is_chol):
+        """Simulate the vector eps given a square root of its covariance."""
+        z = np.random.randn(n_eps, n_sim)
+        if is_chol:
+            # Triangular product sqrt_cov_eps @ z with BLAS trmm, computed in
+            # place on the Fortran-ordered view z.T as z.T @ sqrt_cov_eps.T
+            vec_eps = linalg.blas.dtrmm(
+                1.0, sqrt_cov_eps, z.T, side=1, lower=1, trans_a=1, overwrite_b=1
+            ).T
+        else:
+            vec_eps = sqrt_cov_eps @ z
+        vec_eps += mean_eps[:, None]
         return vec_eps
 
-    return np.sum(
-        simulate_vec_eps(int((n_pce + 1) * (n_pce + 2) / 2), n_mc, *get_cov_eps())
-        * he_m1_m2,
-        axis=0,
+    if n_mc == 0:
+        return np.empty(0)
+
+    mean_eps, cov_eps = get_cov_eps()
+    sqrt_cov_eps, is_chol = factor_cov_eps(cov_eps)
+    return np.concatenate(
+        [
+            np.einsum(
+                "es,es->s",
+                simulate_vec_eps(n_batch, mean_eps, sqrt_cov_eps, is_chol),
+                simulate_he_m1_m2(n_batch),
+            )
+            for n_batch in tab_n_batch
+        ]
     )
 
 